@@ -1,11 +1,20 @@
-import json
+import io
 from pathlib import Path
 
+import numpy as np
+import orjson
 import pandas as pd
 import streamlit as st
 
+try:
+    from numba import njit
+except ImportError:  # numba är valfri; fallbacken ger samma resultat utan JIT
+    njit = None
+
 PLAYERS = ["Johan", "Göran", "Jesper", "Peter", "Magnus", "Tony"]
 MEDALS = ["None", "Bronze", "Silver", "Gold"]
+MEDAL_DTYPE = pd.CategoricalDtype(MEDALS, ordered=True)
+MEDALS_SET = frozenset(MEDALS)
 
 # Repo-data (read-only i Streamlit Cloud)
 REPO_DATA_DIR = Path("data")
@@ -14,7 +23,11 @@ ATHLETES_CSV = REPO_DATA_DIR / "athletes.csv"
 # Writable state directory (avoids read-only repo)
 STATE_DIR = Path.home() / ".streamlit" / "os_tips_state"
 RESULTS_CSV = STATE_DIR / "results.csv"
+PICKS_PARQUET = STATE_DIR / "picks.parquet"
+
+# Äldre lagringsformat; läses bara för engångsmigrering till parquet.
 PICKS_JSON = STATE_DIR / "picks.json"
+PICKS_LOG = STATE_DIR / "picks.log"
 
 # Set to "" to disable password
 ADMIN_PASSWORD = "admin"
@@ -26,27 +39,57 @@ def ensure_state_dir():
     STATE_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def _mtime(path: Path) -> float:
+    return path.stat().st_mtime if path.exists() else 0.0
+
+
 def atomic_write_text(path: Path, text: str, encoding: str = "utf-8"):
     tmp = path.with_suffix(path.suffix + ".tmp")
     tmp.write_text(text, encoding=encoding)
     tmp.replace(path)
 
 
+def atomic_write_bytes(path: Path, data: bytes):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+
+
+@st.cache_data(show_spinner=False)
 def load_athletes() -> pd.DataFrame:
     if not ATHLETES_CSV.exists():
         st.error("Saknar data/athletes.csv i repot. Lägg filen i mappen data/ och committa till GitHub.")
         st.stop()
 
-    df = pd.read_csv(ATHLETES_CSV)
+    df = pd.read_csv(ATHLETES_CSV, engine="pyarrow")
     required = {"athlete_id", "name", "sport"}
     if not required.issubset(df.columns):
         st.error(f"athletes.csv måste ha kolumnerna: {sorted(required)}")
         st.stop()
 
-    df = df.dropna(subset=["athlete_id", "name", "sport"]).copy()
+    # dropna returnerar redan en ny frame; reset_index räcker för att slippa copy().
+    df = df.dropna(subset=["athlete_id", "name", "sport"]).reset_index(drop=True)
     df["athlete_id"] = df["athlete_id"].astype(str)
     df["name"] = df["name"].astype(str)
-    df["sport"] = df["sport"].astype(str)
+    df["sport"] = df["sport"].astype(str).astype("category")
+    # Sortera en gång här (cachat) så att alla vyer ärver ordningen gratis.
+    return df.sort_values(["sport", "name"]).reset_index(drop=True)
+
+
+@st.cache_data(show_spinner=False)
+def _read_results_csv(path_str: str, mtime: float) -> pd.DataFrame:
+    # mtime ingår i cache-nyckeln så att ändringar på disk invaliderar cachen.
+    df = pd.read_csv(path_str, engine="pyarrow")
+    required = {"athlete_id", "medal"}
+    if not required.issubset(df.columns):
+        st.error(f"results.csv måste ha kolumnerna: {sorted(required)}")
+        st.stop()
+
+    df["athlete_id"] = df["athlete_id"].astype(str)
+    # Dubbletter får inte nå merge-stegen (validate="one_to_one"); sista raden vinner.
+    df = df.drop_duplicates(subset="athlete_id", keep="last")
+    # Okända medaljvärden blir NaN vid kategorisering och faller tillbaka till "None".
+    df["medal"] = df["medal"].astype(str).astype(MEDAL_DTYPE).fillna("None")
     return df
 
 
@@ -56,71 +99,214 @@ def load_results(athletes: pd.DataFrame) -> pd.DataFrame:
         out["medal"] = "None"
         atomic_write_text(RESULTS_CSV, out.to_csv(index=False))
 
-    df = pd.read_csv(RESULTS_CSV)
-    required = {"athlete_id", "medal"}
-    if not required.issubset(df.columns):
-        st.error(f"results.csv måste ha kolumnerna: {sorted(required)}")
-        st.stop()
-
-    df["athlete_id"] = df["athlete_id"].astype(str)
-    df["medal"] = df["medal"].astype(str)
-    df.loc[~df["medal"].isin(MEDALS), "medal"] = "None"
+    df = _read_results_csv(str(RESULTS_CSV), RESULTS_CSV.stat().st_mtime)
 
-    merged = athletes[["athlete_id"]].merge(df, on="athlete_id", how="left")
+    merged = athletes[["athlete_id"]].merge(df, on="athlete_id", how="left", validate="one_to_one", sort=False)
     merged["medal"] = merged["medal"].fillna("None")
     return merged
 
 
+@st.cache_data(show_spinner=False)
+def _file_bytes(path_str: str, mtime: float) -> bytes:
+    return Path(path_str).read_bytes()
+
+
+@st.cache_data(show_spinner=False)
+def _picks_backup_bytes(mtime: float) -> bytes:
+    # Backupformatet är fortfarande nästlad JSON så att gamla säkerhetskopior funkar.
+    return orjson.dumps(picks_df_to_dict(load_picks_df()))
+
+
+@st.cache_data(show_spinner=False)
+def results_by_id(results: pd.DataFrame) -> pd.Series:
+    # Hashad Index byggs en gång; uppslagen i build_scoreboard blir C-nivå reindex.
+    return results.set_index("athlete_id")["medal"]
+
+
+@st.cache_data(show_spinner=False)
+def get_sports(athletes: pd.DataFrame) -> list:
+    return sorted(athletes["sport"].unique().tolist())
+
+
+@st.cache_data(show_spinner=False)
+def build_res_view(athletes_mtime: float, results_mtime: float) -> pd.DataFrame:
+    # Nycklas på källfilernas mtime; loaderna under är själva cachade så träffen är billig.
+    athletes = load_athletes()
+    results = load_results(athletes)
+    view = results.merge(
+        athletes[["athlete_id", "name", "sport"]], on="athlete_id", how="left", validate="one_to_one", sort=False
+    )
+    return view[["sport", "name", "athlete_id", "medal"]]
+
+
+@st.cache_data(show_spinner=False)
+def athletes_by_sport(athletes: pd.DataFrame) -> dict:
+    # Dict-uppslag i stället för boolesk maskning av hela framen per rerun.
+    return {s: g.reset_index(drop=True) for s, g in athletes.groupby("sport", sort=True, observed=True)}
+
+
+@st.cache_data(show_spinner=False)
+def build_user_picks_view(athletes: pd.DataFrame, picks_items: tuple) -> pd.DataFrame:
+    # picks_items är en sorterad tuple av (athlete_id, pick) så att cachen kan hasha den.
+    view = athletes.merge(
+        pd.DataFrame(picks_items, columns=["athlete_id", "pick"]),
+        on="athlete_id",
+        how="inner",
+        validate="one_to_one",
+        sort=False,
+    )
+    return view[["sport", "name", "athlete_id", "pick"]].reset_index(drop=True)
+
+
 def save_results(results_df: pd.DataFrame):
     atomic_write_text(RESULTS_CSV, results_df.to_csv(index=False))
 
 
-def load_picks() -> dict:
-    if not PICKS_JSON.exists():
-        return {}
-    try:
-        return json.loads(PICKS_JSON.read_text(encoding="utf-8"))
-    except Exception:
-        return {}
-
-
-def save_picks(picks: dict):
-    atomic_write_text(PICKS_JSON, json.dumps(picks, ensure_ascii=False, indent=2))
-
-
-def score_pick(pick: str, actual: str) -> int:
-    if actual == "None":
-        return 0
-    if pick == actual:
-        return 5
-    if pick != "None" and actual != "None":
-        return 2
-    return 0
-
-
-def build_scoreboard(athletes: pd.DataFrame, results: pd.DataFrame, picks_all: dict) -> pd.DataFrame:
-    results_map = dict(zip(results["athlete_id"], results["medal"]))
-    rows = []
-    for p in PLAYERS:
-        user_picks = picks_all.get(p, {})
-        total = exact = right_person = 0
-        for aid in athletes["athlete_id"].tolist():
-            pick = user_picks.get(aid, "None")
-            actual = results_map.get(aid, "None")
-            pts = score_pick(pick, actual)
-            total += pts
-            if actual != "None" and pick == actual:
-                exact += 1
-            elif actual != "None" and pick != "None":
-                right_person += 1
-        rows.append({"Tippare": p, "Poäng": total, "Exakta (5p)": exact, "Rätt medaljör (2p)": right_person})
-    return pd.DataFrame(rows).sort_values(["Poäng", "Exakta (5p)"], ascending=False).reset_index(drop=True)
+def _empty_picks_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "player": pd.Series([], dtype=str),
+            "athlete_id": pd.Series([], dtype=str),
+            "pick": pd.Series([], dtype=MEDAL_DTYPE),
+        }
+    )
+
+
+def picks_df_to_dict(picks_df: pd.DataFrame) -> dict:
+    return {p: dict(zip(g["athlete_id"], g["pick"])) for p, g in picks_df.groupby("player", sort=True)}
+
+
+def picks_dict_to_df(picks: dict) -> pd.DataFrame:
+    rows = [(p, aid, m) for p, d in picks.items() for aid, m in d.items()]
+    if not rows:
+        return _empty_picks_df()
+    df = pd.DataFrame(rows, columns=["player", "athlete_id", "pick"])
+    df["pick"] = df["pick"].astype(str).astype(MEDAL_DTYPE).fillna("None")
+    return df
+
+
+def _load_legacy_picks() -> dict:
+    # Gamla formatet: nästlad picks.json plus append-logg med deltan (m=None = borttag).
+    picks = {}
+    if PICKS_JSON.exists():
+        try:
+            picks = orjson.loads(PICKS_JSON.read_bytes())
+        except Exception:
+            picks = {}
+    if PICKS_LOG.exists():
+        try:
+            with PICKS_LOG.open("rb") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    entry = orjson.loads(line)
+                    if entry["m"] is None:
+                        picks.get(entry["p"], {}).pop(entry["a"], None)
+                    else:
+                        picks.setdefault(entry["p"], {})[entry["a"]] = entry["m"]
+        except Exception:
+            pass
+    return picks
+
+
+@st.cache_data(show_spinner=False)
+def _read_picks_parquet(path_str: str, mtime: float) -> pd.DataFrame:
+    return pd.read_parquet(path_str)
+
+
+def load_picks_df() -> pd.DataFrame:
+    if not PICKS_PARQUET.exists():
+        legacy = _load_legacy_picks()
+        if not legacy:
+            return _empty_picks_df()
+        save_picks_df(picks_dict_to_df(legacy))
+    return _read_picks_parquet(str(PICKS_PARQUET), PICKS_PARQUET.stat().st_mtime)
+
+
+def save_picks_df(picks_df: pd.DataFrame):
+    buf = io.BytesIO()
+    picks_df.to_parquet(buf, index=False)
+    atomic_write_bytes(PICKS_PARQUET, buf.getvalue())
+
+
+def save_pick(picks_df: pd.DataFrame, player: str, athlete_id: str, medal) -> pd.DataFrame:
+    # medal=None tar bort raden; annars ersätts/sätts spelarens tips för atleten.
+    mask = (picks_df["player"] == player) & (picks_df["athlete_id"] == athlete_id)
+    picks_df = picks_df[~mask]
+    if medal is not None:
+        row = pd.DataFrame(
+            {"player": [player], "athlete_id": [athlete_id], "pick": pd.Categorical([medal], dtype=MEDAL_DTYPE)}
+        )
+        picks_df = pd.concat([picks_df, row], ignore_index=True)
+    save_picks_df(picks_df)
+    return picks_df
+
+
+def _score_kernel_loop(picks_codes, actual_codes):
+    # Exakt medalj = 5p, rätt medaljör men fel valör = 2p, annars 0p.
+    # Loopformen finns bara som källa åt numba; utan JIT körs _score_kernel_np.
+    n_players, n_athletes = picks_codes.shape
+    points = np.zeros(n_players, dtype=np.int64)
+    exact = np.zeros(n_players, dtype=np.int64)
+    right_person = np.zeros(n_players, dtype=np.int64)
+    for p in range(n_players):
+        for a in range(n_athletes):
+            actual = actual_codes[a]
+            if actual == 0:
+                continue
+            pick = picks_codes[p, a]
+            if pick == actual:
+                points[p] += 5
+                exact[p] += 1
+            elif pick != 0:
+                points[p] += 2
+                right_person[p] += 1
+    return points, exact, right_person
+
+
+def _score_kernel_np(picks_codes, actual_codes):
+    # Samma regler som _score_kernel_loop, vektoriserat över hela matrisen.
+    scored = actual_codes > 0
+    exact = scored & (picks_codes == actual_codes)
+    right_person = scored & (picks_codes > 0) & ~exact
+    n_exact = exact.sum(axis=1)
+    n_right_person = right_person.sum(axis=1)
+    return n_exact * 5 + n_right_person * 2, n_exact, n_right_person
+
+
+if njit is not None:
+    _score_kernel = njit(cache=True)(_score_kernel_loop)
+    # Värm upp JIT:en vid import så första scoreboard-rendern slipper kompileringen.
+    _score_kernel(np.zeros((1, 1), dtype=np.int8), np.zeros(1, dtype=np.int8))
+else:
+    _score_kernel = _score_kernel_np
+
+
+def build_scoreboard(athletes: pd.DataFrame, results: pd.DataFrame, picks_df: pd.DataFrame) -> pd.DataFrame:
+    # Packa tipsen till en int8-matris [tippare, atlet] av kategorikoder (0 = "None")
+    # och kör poängkärnan över den; med numba installerat JIT-kompileras loopen.
+    athlete_index = pd.Index(athletes["athlete_id"])
+    actual = results_by_id(results).reindex(athlete_index.to_numpy(), fill_value="None")
+    actual_codes = actual.cat.codes.to_numpy().astype(np.int8)
+
+    picks_codes = np.zeros((len(PLAYERS), len(athlete_index)), dtype=np.int8)
+    rows = pd.Index(PLAYERS).get_indexer(picks_df["player"])
+    cols = athlete_index.get_indexer(picks_df["athlete_id"])
+    valid = (rows >= 0) & (cols >= 0)
+    picks_codes[rows[valid], cols[valid]] = picks_df["pick"].cat.codes.to_numpy()[valid]
+
+    points, exact, right_person = _score_kernel(picks_codes, actual_codes)
+    board = pd.DataFrame(
+        {"Tippare": PLAYERS, "Poäng": points, "Exakta (5p)": exact, "Rätt medaljör (2p)": right_person}
+    )
+    return board.sort_values(["Poäng", "Exakta (5p)"], ascending=False).reset_index(drop=True)
 
 
 ensure_state_dir()
 athletes = load_athletes()
 results = load_results(athletes)
-picks_all = load_picks()
+picks_df = load_picks_df()
 
 st.title("OS-tips – Sverige (vinter-OS 2026)")
 st.caption("Tips sparas i en skrivbar state-katalog. Använd Backup/Restore för säkerhetskopia.")
@@ -133,57 +319,64 @@ with tabs[0]:
     with left:
         st.subheader("Välj tippare")
         player = st.selectbox("Tippare", PLAYERS)
+        player_rows = picks_df[picks_df["player"] == player]
+        user_picks = dict(zip(player_rows["athlete_id"], player_rows["pick"]))
 
         st.subheader("Välj sport och atlet")
-        sports = sorted(athletes["sport"].unique().tolist())
+        sports = get_sports(athletes)
         sport = st.selectbox("Sport", sports)
 
-        athletes_in_sport = athletes[athletes["sport"] == sport].sort_values("name")
-        athlete_label_map = {
-            f"{row['name']} ({row['athlete_id']})": row["athlete_id"]
-            for _, row in athletes_in_sport.iterrows()
-        }
-        athlete_label = st.selectbox("Atlet", list(athlete_label_map.keys()))
-        athlete_id = athlete_label_map[athlete_label]
-
-        existing_pick = picks_all.get(player, {}).get(athlete_id, "None")
-        medal = st.selectbox("Ditt tips", MEDALS, index=MEDALS.index(existing_pick) if existing_pick in MEDALS else 0)
-
-        colA, colB = st.columns(2)
-        with colA:
-            if st.button("Spara/uppdatera tips", use_container_width=True):
-                picks_all.setdefault(player, {})
-                picks_all[player][athlete_id] = medal
-                save_picks(picks_all)
+        athletes_in_sport = athletes_by_sport(athletes)[sport]
+        names = athletes_in_sport["name"].to_numpy()
+        ids = athletes_in_sport["athlete_id"].to_numpy()
+        athlete_label_map = {f"{n} ({i})": i for n, i in zip(names, ids)}
+
+        # Formuläret batchar atlet- och medaljvalen: scriptet kör bara om vid submit,
+        # inte per widgetändring. Tippare och sport ligger utanför eftersom de styr
+        # vilka alternativ som visas.
+        with st.form("pick_form"):
+            athlete_label = st.selectbox("Atlet", list(athlete_label_map.keys()))
+            athlete_id = athlete_label_map[athlete_label]
+
+            existing_pick = user_picks.get(athlete_id, "None")
+            medal = st.selectbox(
+                "Ditt tips", MEDALS, index=MEDALS.index(existing_pick) if existing_pick in MEDALS_SET else 0
+            )
+
+            colA, colB = st.columns(2)
+            with colA:
+                submitted = st.form_submit_button("Spara/uppdatera tips", use_container_width=True)
+            with colB:
+                removed = st.form_submit_button("Ta bort tips för denna atlet", use_container_width=True)
+
+        if submitted:
+            # Hoppa över diskskrivningen om tipset är oförändrat (dubbelklick m.m.).
+            if user_picks.get(athlete_id) == medal:
                 st.success("Sparat!")
-        with colB:
-            if st.button("Ta bort tips för denna atlet", use_container_width=True):
-                if player in picks_all and athlete_id in picks_all[player]:
-                    del picks_all[player][athlete_id]
-                    save_picks(picks_all)
-                    st.success("Borttaget!")
+            else:
+                picks_df = save_pick(picks_df, player, athlete_id, medal)
+                user_picks[athlete_id] = medal
+                st.success("Sparat!")
+        if removed:
+            if athlete_id in user_picks:
+                picks_df = save_pick(picks_df, player, athlete_id, None)
+                del user_picks[athlete_id]
+                st.success("Borttaget!")
 
     with right:
         st.subheader(f"{player}s sparade tips")
-        user_picks = picks_all.get(player, {})
         if not user_picks:
             st.info("Inga tips sparade ännu.")
         else:
-            view = athletes.merge(
-                pd.DataFrame([{"athlete_id": k, "pick": v} for k, v in user_picks.items()]),
-                on="athlete_id",
-                how="right"
-            )
-            view = view[["sport", "name", "athlete_id", "pick"]].sort_values(["sport", "name"]).reset_index(drop=True)
+            view = build_user_picks_view(athletes, tuple(sorted(user_picks.items())))
             st.dataframe(view, use_container_width=True, hide_index=True)
 
 with tabs[1]:
     st.subheader("Scoreboard")
-    st.dataframe(build_scoreboard(athletes, results, picks_all), use_container_width=True, hide_index=True)
+    st.dataframe(build_scoreboard(athletes, results, picks_df), use_container_width=True, hide_index=True)
 
     st.subheader("Resultat")
-    res_view = results.merge(athletes[["athlete_id", "name", "sport"]], on="athlete_id", how="left")
-    res_view = res_view[["sport", "name", "athlete_id", "medal"]].sort_values(["sport", "name"]).reset_index(drop=True)
+    res_view = build_res_view(_mtime(ATHLETES_CSV), _mtime(RESULTS_CSV))
     st.dataframe(res_view, use_container_width=True, hide_index=True)
 
 with tabs[2]:
@@ -200,41 +393,41 @@ with tabs[2]:
     else:
         st.success("Admin-läge aktivt.")
 
-        res = results.merge(athletes[["athlete_id", "name", "sport"]], on="athlete_id", how="left")
-        res = res[["sport", "name", "athlete_id", "medal"]].sort_values(["sport", "name"]).reset_index(drop=True)
-
-        updated = []
-        for _, row in res.iterrows():
-            c1, c2, c3, c4 = st.columns([2.5, 2.5, 2.5, 1.5])
-            with c1: st.write(row["sport"])
-            with c2: st.write(row["name"])
-            with c3: st.write(row["athlete_id"])
-            with c4:
-                new_medal = st.selectbox(
-                    "Medalj",
-                    MEDALS,
-                    index=MEDALS.index(row["medal"]) if row["medal"] in MEDALS else 0,
-                    key=f"admin_{row['athlete_id']}"
-                )
-            updated.append((row["athlete_id"], new_medal))
+        res = build_res_view(_mtime(ATHLETES_CSV), _mtime(RESULTS_CSV))
+
+        # Skrivskyddade kolumner visas i en vanlig dataframe; editorn bär bara
+        # medaljkolumnen, så payloaden till klienten blir minimal.
+        info_col, edit_col = st.columns([2, 1])
+        with info_col:
+            st.dataframe(res[["sport", "name", "athlete_id"]], use_container_width=True, hide_index=True)
+        with edit_col:
+            edited = st.data_editor(
+                res[["athlete_id", "medal"]],
+                column_config={
+                    "medal": st.column_config.SelectboxColumn("Medalj", options=MEDALS, required=True),
+                },
+                disabled=["athlete_id"],
+                hide_index=True,
+                use_container_width=True,
+                key="admin_editor",
+            )
 
         if st.button("Spara resultat"):
-            out = pd.DataFrame(updated, columns=["athlete_id", "medal"])
-            save_results(out)
+            save_results(edited[["athlete_id", "medal"]])
             st.success("Resultat sparade!")
 
 with tabs[3]:
     st.subheader("Backup")
     st.download_button(
         "Ladda ner picks.json",
-        data=PICKS_JSON.read_bytes() if PICKS_JSON.exists() else b"{}",
+        data=_picks_backup_bytes(_mtime(PICKS_PARQUET)),
         file_name="picks.json",
         mime="application/json",
         use_container_width=True
     )
     st.download_button(
         "Ladda ner results.csv",
-        data=RESULTS_CSV.read_bytes() if RESULTS_CSV.exists() else b"athlete_id,medal\n",
+        data=_file_bytes(str(RESULTS_CSV), _mtime(RESULTS_CSV)) if RESULTS_CSV.exists() else b"athlete_id,medal\n",
         file_name="results.csv",
         mime="text/csv",
         use_container_width=True
@@ -245,8 +438,8 @@ with tabs[3]:
     up_picks = st.file_uploader("Ladda upp picks.json", type=["json"])
     if up_picks is not None:
         try:
-            restored = json.loads(up_picks.read().decode("utf-8"))
-            save_picks(restored)
+            restored = orjson.loads(up_picks.read())
+            save_picks_df(picks_dict_to_df(restored))
             st.success("Återställde picks.json!")
         except Exception as e:
             st.error(f"Kunde inte läsa JSON: {e}")
@@ -254,13 +447,15 @@ with tabs[3]:
     up_results = st.file_uploader("Ladda upp results.csv", type=["csv"])
     if up_results is not None:
         try:
-            df = pd.read_csv(up_results)
+            df = pd.read_csv(up_results, engine="pyarrow")
             if not {"athlete_id", "medal"}.issubset(df.columns):
                 st.error("results.csv måste ha kolumnerna athlete_id, medal")
             else:
                 df["athlete_id"] = df["athlete_id"].astype(str)
-                df["medal"] = df["medal"].astype(str)
-                df.loc[~df["medal"].isin(MEDALS), "medal"] = "None"
+                # Samma sanering som i _read_results_csv: dubbletter bort (sista vinner)
+                # och okända värden -> NaN -> "None".
+                df = df.drop_duplicates(subset="athlete_id", keep="last")
+                df["medal"] = df["medal"].astype(str).astype(MEDAL_DTYPE).fillna("None")
                 save_results(df[["athlete_id", "medal"]])
                 st.success("Återställde results.csv!")
         except Exception as e: